@@ -1,16 +1,20 @@
 from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Any, Optional
-import uuid
-from datetime import datetime
+from functools import lru_cache, partial
+from urllib.parse import quote_plus
+from datetime import datetime, timezone
 import json
 import re
+import asyncio
+from contextlib import asynccontextmanager
 
 
 ROOT_DIR = Path(__file__).parent
@@ -18,11 +22,30 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncMongoClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serves the newest-first sort in /commands without a collection scan
+    try:
+        await db.voice_commands.create_index([("timestamp", -1)])
+    except Exception as e:
+        logger.error(f"Error creating indexes: {str(e)}")
+
+    # Created here so the queue belongs to the loop that serves requests
+    history_queue = asyncio.Queue(maxsize=HISTORY_QUEUE_SIZE)
+    app.state.history_queue = history_queue
+    history_flusher = asyncio.create_task(flush_voice_commands(history_queue))
+    yield
+
+    # Let the flusher write out any queued commands before closing
+    await history_queue.put(None)
+    await history_flusher
+    await client.close()
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -31,150 +54,283 @@ api_router = APIRouter(prefix="/api")
 # Define Models
 class CommandRequest(BaseModel):
     command: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class CommandResponse(BaseModel):
+    # Frozen so prebuilt responses can be shared between requests
+    model_config = ConfigDict(frozen=True)
+
     response: str
     action: Optional[str] = None
     url: Optional[str] = None
     success: bool = True
 
 class VoiceCommand(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     command: str
     response: str
     action: Optional[str] = None
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 # Command Processing Logic
-class CommandProcessor:
-    def __init__(self):
-        self.website_patterns = {
-            r'(?:open|go to|visit)\s+youtube': {
-                'url': 'https://www.youtube.com',
-                'response': 'Opening YouTube for you, sir.'
-            },
-            r'(?:open|go to|visit)\s+google': {
-                'url': 'https://www.google.com',
-                'response': 'Opening Google for you, sir.'
-            },
-            r'(?:open|go to|visit)\s+facebook': {
-                'url': 'https://www.facebook.com',
-                'response': 'Opening Facebook for you, sir.'
-            },
-            r'(?:open|go to|visit)\s+twitter': {
-                'url': 'https://www.twitter.com',
-                'response': 'Opening Twitter for you, sir.'
-            },
-            r'(?:open|go to|visit)\s+instagram': {
-                'url': 'https://www.instagram.com',
-                'response': 'Opening Instagram for you, sir.'
-            },
-            r'(?:open|go to|visit)\s+linkedin': {
-                'url': 'https://www.linkedin.com',
-                'response': 'Opening LinkedIn for you, sir.'
-            },
-            r'(?:open|go to|visit)\s+github': {
-                'url': 'https://www.github.com',
-                'response': 'Opening GitHub for you, sir.'
-            },
-            r'(?:open|go to|visit)\s+netflix': {
-                'url': 'https://www.netflix.com',
-                'response': 'Opening Netflix for you, sir.'
-            },
-            r'(?:open|go to|visit)\s+amazon': {
-                'url': 'https://www.amazon.com',
-                'response': 'Opening Amazon for you, sir.'
-            },
-        }
-        
-        self.search_patterns = {
-            r'search\s+(?:for\s+)?(.+?)\s+(?:on|in)\s+youtube': {
-                'url_template': 'https://www.youtube.com/results?search_query={}',
-                'response': 'Searching {} on YouTube for you, sir.'
-            },
-            r'search\s+(?:for\s+)?(.+?)\s+(?:on|in)\s+google': {
-                'url_template': 'https://www.google.com/search?q={}',
-                'response': 'Searching {} on Google for you, sir.'
-            },
-            r'(?:search|google)\s+(?:for\s+)?(.+)': {
-                'url_template': 'https://www.google.com/search?q={}',
-                'response': 'Searching {} on Google for you, sir.'
-            },
-        }
-        
-        self.greeting_patterns = {
-            r'(?:hello|hi|hey)\s+(?:jarvis|assistant)': 'Hello sir, how may I assist you today?',
-            r'(?:hello|hi|hey)': 'Hello sir, I am Jarvis, your AI assistant. How may I help you?',
-            r'(?:how are you|how\'re you)': 'I am functioning optimally, sir. Ready to assist you.',
-            r'(?:good morning|morning)': 'Good morning, sir. How may I assist you today?',
-            r'(?:good afternoon|afternoon)': 'Good afternoon, sir. How may I assist you today?',
-            r'(?:good evening|evening)': 'Good evening, sir. How may I assist you today?',
-            r'(?:good night|goodnight)': 'Good night, sir. Rest well.',
-            r'(?:thank you|thanks)': 'You are welcome, sir. Always at your service.',
-            r'(?:what is your name|who are you)': 'I am Jarvis, your personal AI assistant, sir.',
-        }
-        
-        self.time_patterns = {
-            r'(?:what time is it|what\'s the time|current time)': self._get_current_time,
-            r'(?:what date is it|what\'s the date|current date)': self._get_current_date,
-        }
-    
-    def _get_current_time(self):
-        now = datetime.now()
-        return f"The current time is {now.strftime('%I:%M %p')}, sir."
-    
-    def _get_current_date(self):
-        now = datetime.now()
-        return f"Today is {now.strftime('%A, %B %d, %Y')}, sir."
+def _get_current_time():
+    now = datetime.now()
+    return f"The current time is {now:%I:%M %p}, sir."
+
+def _get_current_date():
+    now = datetime.now()
+    return f"Today is {now:%A, %B %d, %Y}, sir."
+
+def _respond(data, match):
+    return data['response']
+
+def _search(data, match):
+    search_term = match.group(1).strip()
+    url = data['url_template'].format(quote_plus(search_term))
+    response = data['response'].format(search_term)
+    return CommandResponse(
+        response=response,
+        action='open_url',
+        url=url
+    )
+
+def _tell_time(data, match):
+    return CommandResponse(response=data['func']())
+
+
+# Command patterns are built once at import and shared by every request.
+# Each pattern lists keywords, at least one of which appears in any
+# command it matches; commands with no keyword skip the patterns entirely.
+SITES = {
+    'youtube': {
+        'url': 'https://www.youtube.com',
+        'response': 'Opening YouTube for you, sir.'
+    },
+    'google': {
+        'url': 'https://www.google.com',
+        'response': 'Opening Google for you, sir.'
+    },
+    'facebook': {
+        'url': 'https://www.facebook.com',
+        'response': 'Opening Facebook for you, sir.'
+    },
+    'twitter': {
+        'url': 'https://www.twitter.com',
+        'response': 'Opening Twitter for you, sir.'
+    },
+    'instagram': {
+        'url': 'https://www.instagram.com',
+        'response': 'Opening Instagram for you, sir.'
+    },
+    'linkedin': {
+        'url': 'https://www.linkedin.com',
+        'response': 'Opening LinkedIn for you, sir.'
+    },
+    'github': {
+        'url': 'https://www.github.com',
+        'response': 'Opening GitHub for you, sir.'
+    },
+    'netflix': {
+        'url': 'https://www.netflix.com',
+        'response': 'Opening Netflix for you, sir.'
+    },
+    'amazon': {
+        'url': 'https://www.amazon.com',
+        'response': 'Opening Amazon for you, sir.'
+    },
+}
+
+SITE_RESPONSES = {
+    site: CommandResponse(response=data['response'], action='open_url', url=data['url'])
+    for site, data in SITES.items()
+}
+
+WEBSITE_PATTERNS = {
+    r'(?:open|go to|visit)\s+' + site: {
+        'keywords': (site,),
+        'response': response
+    }
+    for site, response in SITE_RESPONSES.items()
+}
+
+SEARCH_PATTERNS = {
+    r'search\s+(?:for\s+)?(.+?)\s+(?:on|in)\s+youtube': {
+        'keywords': ('search',),
+        'url_template': 'https://www.youtube.com/results?search_query={}',
+        'response': 'Searching {} on YouTube for you, sir.'
+    },
+    r'search\s+(?:for\s+)?(.+?)\s+(?:on|in)\s+google': {
+        'keywords': ('search',),
+        'url_template': 'https://www.google.com/search?q={}',
+        'response': 'Searching {} on Google for you, sir.'
+    },
+    r'(?:search|google)\s+(?:for\s+)?(.+)': {
+        'keywords': ('search', 'google'),
+        'url_template': 'https://www.google.com/search?q={}',
+        'response': 'Searching {} on Google for you, sir.'
+    },
+}
 
+GREETING_PATTERNS = {
+    r'(?:hello|hi|hey)\s+(?:jarvis|assistant)': {
+        'keywords': ('hello', 'hi', 'hey'),
+        'response': CommandResponse(response='Hello sir, how may I assist you today?')
+    },
+    r'(?:hello|hi|hey)': {
+        'keywords': ('hello', 'hi', 'hey'),
+        'response': CommandResponse(response='Hello sir, I am Jarvis, your AI assistant. How may I help you?')
+    },
+    r'(?:how are you|how\'re you)': {
+        'keywords': ('how are you', 'how\'re you'),
+        'response': CommandResponse(response='I am functioning optimally, sir. Ready to assist you.')
+    },
+    r'(?:good morning|morning)': {
+        'keywords': ('morning',),
+        'response': CommandResponse(response='Good morning, sir. How may I assist you today?')
+    },
+    r'(?:good afternoon|afternoon)': {
+        'keywords': ('afternoon',),
+        'response': CommandResponse(response='Good afternoon, sir. How may I assist you today?')
+    },
+    r'(?:good evening|evening)': {
+        'keywords': ('evening',),
+        'response': CommandResponse(response='Good evening, sir. How may I assist you today?')
+    },
+    r'(?:good night|goodnight)': {
+        'keywords': ('good night', 'goodnight'),
+        'response': CommandResponse(response='Good night, sir. Rest well.')
+    },
+    r'(?:thank you|thanks)': {
+        'keywords': ('thank you', 'thanks'),
+        'response': CommandResponse(response='You are welcome, sir. Always at your service.')
+    },
+    r'(?:what is your name|who are you)': {
+        'keywords': ('what is your name', 'who are you'),
+        'response': CommandResponse(response='I am Jarvis, your personal AI assistant, sir.')
+    },
+}
+
+TIME_PATTERNS = {
+    r'(?:what time is it|what\'s the time|current time)': {
+        'keywords': ('time',),
+        'func': _get_current_time
+    },
+    r'(?:what date is it|what\'s the date|current date)': {
+        'keywords': ('date',),
+        'func': _get_current_date
+    },
+}
+
+# Every "<verb> <site>" phrase, so plain website commands need a single lookup
+OPEN_COMMANDS = {
+    f'{verb} {site}': response
+    for verb in ('open', 'go to', 'visit')
+    for site, response in SITE_RESPONSES.items()
+}
+
+# Every pattern compiled once, in priority order, with the handler for its
+# category, plus one regex matching any keyword of any pattern
+def _compile_patterns():
+    compiled = []
+    keywords = []
+    for patterns, handler in (
+        (WEBSITE_PATTERNS, _respond),
+        (SEARCH_PATTERNS, _search),
+        (GREETING_PATTERNS, _respond),
+        (TIME_PATTERNS, _tell_time),
+    ):
+        for pattern, data in patterns.items():
+            # Catch patterns added without keywords, or listing keywords
+            # that do not appear in the pattern itself
+            source = pattern.replace('\\', '')
+            if not data['keywords'] or not all(k in source for k in data['keywords']):
+                raise ValueError(f"Keywords {data['keywords']!r} do not match pattern {pattern!r}")
+            keywords.extend(data['keywords'])
+            compiled.append((re.compile(pattern, re.IGNORECASE), partial(handler, data)))
+    keyword_re = re.compile('|'.join(map(re.escape, dict.fromkeys(keywords))), re.IGNORECASE)
+    return compiled, keyword_re
+
+COMMAND_PATTERNS, KEYWORD_RE = _compile_patterns()
+
+# Default response for unrecognized commands
+UNRECOGNIZED_RESPONSE = CommandResponse(
+    response="I'm sorry sir, I didn't understand that command. Please try again.",
+    success=False
+)
+
+def _match_command(command):
+    if not KEYWORD_RE.search(command):
+        return None
+    for pattern, handler in COMMAND_PATTERNS:
+        match = pattern.search(command)
+        if match:
+            return handler, match
+    return None
+
+# Repeated commands reuse the earlier match. Only the match is cached,
+# so handlers still run and time/date answers stay current. Long commands
+# bypass the cache so it cannot pin large request bodies in memory.
+CACHED_COMMAND_LENGTH = 256
+_cached_match_command = lru_cache(maxsize=512)(_match_command)
+
+
+class CommandProcessor:
     def process_command(self, command: str) -> CommandResponse:
-        command = command.lower().strip()
+        command = command.strip().lower()
+        if not command:
+            return UNRECOGNIZED_RESPONSE
         
-        # Check website opening patterns
-        for pattern, data in self.website_patterns.items():
-            if re.search(pattern, command, re.IGNORECASE):
-                return CommandResponse(
-                    response=data['response'],
-                    action='open_url',
-                    url=data['url']
-                )
+        # Plain "open <site>" commands resolve with a dict lookup
+        response = OPEN_COMMANDS.get(command)
+        if response:
+            return response
         
-        # Check search patterns
-        for pattern, data in self.search_patterns.items():
-            match = re.search(pattern, command, re.IGNORECASE)
-            if match:
-                search_term = match.group(1).strip()
-                url = data['url_template'].format(search_term.replace(' ', '+'))
-                response = data['response'].format(search_term)
-                return CommandResponse(
-                    response=response,
-                    action='open_url',
-                    url=url
-                )
+        if len(command) <= CACHED_COMMAND_LENGTH:
+            found = _cached_match_command(command)
+        else:
+            found = _match_command(command)
+        if found:
+            handler, match = found
+            return handler(match)
         
-        # Check greeting patterns
-        for pattern, response in self.greeting_patterns.items():
-            if re.search(pattern, command, re.IGNORECASE):
-                return CommandResponse(response=response)
-        
-        # Check time patterns
-        for pattern, func in self.time_patterns.items():
-            if re.search(pattern, command, re.IGNORECASE):
-                response = func() if callable(func) else func
-                return CommandResponse(response=response)
-        
-        # Default response for unrecognized commands
-        return CommandResponse(
-            response="I'm sorry sir, I didn't understand that command. Please try again.",
-            success=False
-        )
+        return UNRECOGNIZED_RESPONSE
 
 
 # Initialize command processor
 command_processor = CommandProcessor()
 
+# Command history is written in batches by a background flusher task
+HISTORY_BATCH_SIZE = 50
+HISTORY_FLUSH_INTERVAL = 0.1  # seconds
+HISTORY_QUEUE_SIZE = 10000
+
+async def store_voice_commands(documents: List[Dict[str, Any]]):
+    try:
+        await db.voice_commands.insert_many(documents, ordered=False)
+    except Exception as e:
+        logger.error(f"Error storing commands: {str(e)}")
+
+async def flush_voice_commands(history_queue: asyncio.Queue):
+    """Drain the history queue into MongoDB until a None sentinel is received."""
+    loop = asyncio.get_running_loop()
+    while True:
+        document = await history_queue.get()
+        if document is None:
+            return
+        batch = [document]
+        deadline = loop.time() + HISTORY_FLUSH_INTERVAL
+        while len(batch) < HISTORY_BATCH_SIZE:
+            try:
+                document = await asyncio.wait_for(history_queue.get(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if document is None:
+                # Write what we have, then stop on the next iteration
+                history_queue.put_nowait(None)
+                break
+            batch.append(document)
+        await store_voice_commands(batch)
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
@@ -186,35 +342,59 @@ async def process_voice_command(request: CommandRequest):
         # Process the command
         result = command_processor.process_command(request.command)
         
-        # Store command in database
+        # Queue command for the history flusher
         voice_command = VoiceCommand(
             command=request.command,
             response=result.response,
             action=result.action
         )
-        await db.voice_commands.insert_one(voice_command.dict())
+        try:
+            app.state.history_queue.put_nowait(voice_command.model_dump())
+        except asyncio.QueueFull:
+            # Mongo is not keeping up; answer the command but skip its history entry
+            logger.warning("Command history queue is full, dropping command")
         
         return result
     except Exception as e:
         logger.error(f"Error processing command: {str(e)}")
         raise HTTPException(status_code=500, detail="Error processing command")
 
-@api_router.get("/commands", response_model=List[VoiceCommand])
-async def get_command_history():
-    commands = await db.voice_commands.find().sort("timestamp", -1).to_list(50)
-    return [VoiceCommand(**cmd) for cmd in commands]
+@api_router.get("/commands", response_model=None)
+async def get_command_history() -> List[Dict[str, Any]]:
+    # Documents were written from VoiceCommand models, so skip re-validating them
+    cursor = db.voice_commands.find(
+        {},
+        projection={
+            '_id': 0,
+            'id': {'$toString': '$_id'},
+            'command': 1,
+            'response': 1,
+            'action': 1,
+            'timestamp': 1,
+        }
+    ).sort("timestamp", -1).limit(50)
+    return await cursor.to_list(length=50)
 
 @api_router.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+    return {"status": "healthy", "timestamp": datetime.now(timezone.utc)}
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Long origin lists are matched with one compiled regex instead of a list scan
+CORS_REGEX_THRESHOLD = 8
+cors_origins = [o.strip() for o in os.environ.get('CORS_ORIGINS', '*').split(',') if o.strip()]
+cors_origin_regex = None
+if len(cors_origins) > CORS_REGEX_THRESHOLD and '*' not in cors_origins:
+    cors_origin_regex = '(?:' + '|'.join(map(re.escape, cors_origins)) + ')'
+    cors_origins = []
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+    allow_origins=cors_origins,
+    allow_origin_regex=cors_origin_regex,
     allow_methods=["*"],
     allow_headers=["*"],
 )
@@ -224,8 +404,4 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+logger = logging.getLogger(__name__)
\ No newline at end of file